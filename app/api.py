@@ -1,11 +1,13 @@
 import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, Response, WebSocket, WebSocketDisconnect, File, UploadFile
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 import os
 import shutil
-from . import crud, schemas, models, security, services
+import time
+from . import crud, schemas, models, security, services, metrics
 from .deps import get_db, get_current_user
 
 router = APIRouter()
@@ -96,6 +98,7 @@ async def delete_room(
     if room.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this room")
     await crud.delete_room(db, room_id=room_id)
+    await services.redis_manager.purge_room(room_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/rooms/{room_id}/join", status_code=status.HTTP_201_CREATED)
@@ -159,6 +162,8 @@ async def websocket_endpoint(
     if not membership:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User not a member of this room")
         return
+    # End the read transaction so an idle socket does not pin a pooled connection.
+    await db.commit()
 
     await services.connection_manager.connect(websocket, room_id)
     await services.redis_manager.add_active_user(room_id, user.id)
@@ -170,19 +175,32 @@ async def websocket_endpoint(
     try:
         while True:
             data = await websocket.receive_text()
-            message_data = schemas.MessageCreate.model_validate_json(data)
+            received_at = time.time()
+            with metrics.PIPELINE_STAGE_SECONDS.labels("validate").time():
+                message_data = schemas.MessageCreate.model_validate_json(data)
             
-            db_message = await crud.create_message(
-                db, 
-                message=message_data, 
-                room_id=room_id, 
-                user_id=user.id
-            )
-            await db.refresh(db_message, attribute_names=['author'])
+            with metrics.PIPELINE_STAGE_SECONDS.labels("persist").time():
+                db_message = await crud.create_message(
+                    db, 
+                    message=message_data, 
+                    room_id=room_id, 
+                    user_id=user.id
+                )
+                await db.refresh(db_message, attribute_names=['author'])
+                await db.commit()
             
-            await services.redis_manager.publish_message(room_id, schemas.Message.from_orm(db_message))
+            with metrics.PIPELINE_STAGE_SECONDS.labels("publish").time():
+                await services.redis_manager.publish_message(
+                    room_id, schemas.Message.from_orm(db_message), received_at
+                )
 
     except WebSocketDisconnect:
+        pass
+    except IntegrityError:
+        # The room was deleted while this socket was still sending.
+        await db.rollback()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Room no longer exists")
+    finally:
         services.connection_manager.disconnect(websocket, room_id)
         await services.redis_manager.remove_active_user(room_id, user.id)
         if not redis_listener_task.done():
@@ -0,0 +1,198 @@
+import asyncio
+import datetime
+import gzip
+import heapq
+import itertools
+import json
+import os
+import shutil
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from .settings import settings
+from . import models
+
+ARCHIVE_CHUNK_SIZE = 5000
+PARTITION_SUFFIX = ".jsonl.gz"
+INDEX_NAME = "index.json"
+
+def _room_dir(room_id: int) -> str:
+    return os.path.join(settings.MESSAGE_ARCHIVE_DIR, f"room_{room_id}")
+
+def _partition_name(created_at: datetime.datetime) -> str:
+    return f"{created_at:%Y-%m}{PARTITION_SUFFIX}"
+
+def _serialize(message: models.Message) -> dict:
+    return {
+        "id": message.id,
+        "room_id": message.room_id,
+        "user_id": message.user_id,
+        "content": message.content,
+        "created_at": message.created_at.isoformat(timespec="microseconds"),
+        "type": message.type,
+        "file_url": message.file_url,
+        "author": {"id": message.author.id, "name": message.author.name, "role": message.author.role},
+    }
+
+def _deserialize(record: dict) -> models.Message:
+    # Transient objects: never added to a session, only rendered by the API.
+    return models.Message(
+        id=record["id"],
+        room_id=record["room_id"],
+        user_id=record["user_id"],
+        content=record["content"],
+        created_at=datetime.datetime.fromisoformat(record["created_at"]),
+        type=record["type"],
+        file_url=record["file_url"],
+        author=models.User(**record["author"]),
+    )
+
+def _sort_key(record: dict) -> Tuple[str, int]:
+    return record["created_at"], record["id"]
+
+def _load_index(room_dir: str) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(room_dir, INDEX_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _replace_file(path: str, write):
+    # Write beside the target and swap it in, so readers never see a partial file.
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _iter_partition(path: str) -> Iterator[str]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+def _write_partition(path: str, records: List[dict]) -> int:
+    existing = (json.loads(line) for line in _iter_partition(path)) if os.path.exists(path) else iter(())
+    count = 0
+
+    def write(tmp_path: str):
+        nonlocal count
+        last_id = None
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            # Both inputs are sorted, so a record archived by an interrupted earlier run
+            # lands next to its copy and is written once.
+            for record in heapq.merge(existing, sorted(records, key=_sort_key), key=_sort_key):
+                if record["id"] == last_id:
+                    continue
+                last_id = record["id"]
+                f.write(json.dumps(record) + "\n")
+                count += 1
+
+    _replace_file(path, write)
+    return count
+
+def _write_partitions(partitions: Dict[Tuple[int, str], List[dict]]):
+    by_room: Dict[int, Dict[str, List[dict]]] = defaultdict(dict)
+    for (room_id, name), records in partitions.items():
+        by_room[room_id][name] = records
+    for room_id, room_partitions in by_room.items():
+        room_dir = _room_dir(room_id)
+        os.makedirs(room_dir, exist_ok=True)
+        index = _load_index(room_dir)
+        for name, records in room_partitions.items():
+            path = os.path.join(room_dir, name)
+            count = _write_partition(path, records)
+            index[name] = {"count": count, "size": os.path.getsize(path)}
+
+        def write_index(tmp_path: str):
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+
+        _replace_file(os.path.join(room_dir, INDEX_NAME), write_index)
+
+def _partition_count(path: str, entry: Optional[dict]) -> int:
+    # The size check catches a partition replaced after the index was last written.
+    if entry and entry["size"] == os.path.getsize(path):
+        return entry["count"]
+    return sum(1 for _ in _iter_partition(path))
+
+def _read_archive_page(room_id: int, skip: int, limit: int) -> List[dict]:
+    room_dir = _room_dir(room_id)
+    index = _load_index(room_dir)
+    names = sorted((name for name in os.listdir(room_dir) if name.endswith(PARTITION_SUFFIX)), reverse=True)
+    page: List[dict] = []
+    for name in names:
+        if len(page) >= limit:
+            break
+        path = os.path.join(room_dir, name)
+        count = _partition_count(path, index.get(name))
+        if skip >= count:
+            skip -= count
+            continue
+        # Partitions are stored oldest first; map the newest-first window onto line numbers.
+        stop = count - skip
+        start = max(0, stop - (limit - len(page)))
+        window = [
+            json.loads(line)
+            for line in itertools.islice(_iter_partition(path), start, stop)
+        ]
+        page.extend(reversed(window))
+        skip = 0
+    return page
+
+async def get_archived_messages(room_id: int, skip: int = 0, limit: int = 50) -> List[models.Message]:
+    if limit <= 0 or not os.path.isdir(_room_dir(room_id)):
+        return []
+    records = await asyncio.to_thread(_read_archive_page, room_id, skip, limit)
+    return [_deserialize(record) for record in records]
+
+async def archive_messages_older_than(
+    db: AsyncSession, cutoff: datetime.datetime, chunk_size: int = ARCHIVE_CHUNK_SIZE
+) -> int:
+    archived = 0
+    while True:
+        query = (
+            select(models.Message)
+            .filter(models.Message.created_at < cutoff)
+            .order_by(models.Message.id)
+            .limit(chunk_size)
+            .options(selectinload(models.Message.author))
+        )
+        result = await db.execute(query)
+        messages = result.scalars().all()
+        if not messages:
+            return archived
+
+        # Delete first and archive only what this transaction removed: a room deleted
+        # since the select has no rows left, so its archive directory is not recreated.
+        # Its row locks also hold off a concurrent delete_room until the files are written.
+        result = await db.execute(
+            delete(models.Message)
+            .where(models.Message.id.in_([message.id for message in messages]))
+            .returning(models.Message.id)
+            .execution_options(synchronize_session=False)
+        )
+        deleted_ids = set(result.scalars().all())
+
+        partitions: Dict[Tuple[int, str], List[dict]] = defaultdict(list)
+        for message in messages:
+            if message.id in deleted_ids:
+                partitions[(message.room_id, _partition_name(message.created_at))].append(_serialize(message))
+        try:
+            await asyncio.to_thread(_write_partitions, partitions)
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+        db.expunge_all()
+        archived += len(deleted_ids)
+
+async def archive_expired_messages(db: AsyncSession) -> int:
+    if settings.MESSAGE_RETENTION_DAYS is None:
+        return 0
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.MESSAGE_RETENTION_DAYS)
+    return await archive_messages_older_than(db, cutoff)
+
+async def delete_room_archive(room_id: int):
+    await asyncio.to_thread(shutil.rmtree, _room_dir(room_id), True)
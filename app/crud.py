@@ -1,7 +1,8 @@
+from sqlalchemy import delete, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from . import models, schemas
+from . import models, schemas, archive
 import datetime
 from typing import List, Optional
 import uuid
@@ -97,8 +98,17 @@ async def get_user_rooms(db: AsyncSession, user_id: int) -> List[models.Room]:
 async def delete_room(db: AsyncSession, room_id: int) -> Optional[models.Room]:
     db_room = await get_room(db, room_id)
     if db_room:
-        await db.delete(db_room)
+        # Bulk statements in one transaction: nothing is loaded into the session, and
+        # databases created before the ON DELETE CASCADE foreign keys still work.
+        for child in (models.Message, models.RoomMember, models.RoomInvite):
+            await db.execute(
+                delete(child)
+                .where(child.room_id == room_id)
+                .execution_options(synchronize_session=False)
+            )
+        await db.execute(delete(models.Room).where(models.Room.id == room_id))
         await db.commit()
+        await archive.delete_room_archive(room_id)
     return db_room
 
 async def add_user_to_room(db: AsyncSession, room_id: int, user_id: int) -> Optional[models.RoomMember]:
@@ -153,7 +163,20 @@ async def get_messages_for_room(db: AsyncSession, room_id: int, skip: int = 0, l
         .options(selectinload(models.Message.author))
     )
     result = await db.execute(query)
-    return result.scalars().all()
+    messages = list(result.scalars().all())
+    if len(messages) < limit:
+        # Page runs past the hot table; continue into archived history. Only a page
+        # that starts beyond the hot rows needs to know how far beyond.
+        archive_skip = 0
+        if not messages and skip:
+            hot_count = await db.scalar(
+                select(func.count(models.Message.id)).filter(models.Message.room_id == room_id)
+            )
+            archive_skip = max(0, skip - hot_count)
+        messages += await archive.get_archived_messages(
+            room_id, skip=archive_skip, limit=limit - len(messages)
+        )
+    return messages
 
 async def create_room_invite(db: AsyncSession, room_id: int) -> models.RoomInvite:
     db_invite = models.RoomInvite(room_id=room_id)
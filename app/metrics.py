@@ -0,0 +1,82 @@
+import asyncio
+import collections
+import sys
+import threading
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from .database import engine
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "chat_pipeline_stage_seconds",
+    "Time spent in each stage of the websocket message pipeline. validate, persist and publish "
+    "are observed once per message; redis_receive, fanout and end_to_end once per room listener, "
+    "and each open socket runs its own listener",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "chat_http_request_seconds",
+    "REST request latency by route",
+    ["method", "route", "status"],
+)
+WS_CONNECTIONS = Gauge(
+    "chat_ws_connections",
+    "Open websocket connections held by this worker, per room",
+    ["room_id"],
+)
+BROADCAST_PENDING = Gauge(
+    "chat_broadcast_pending",
+    "Room listeners still fanning out a message received from Redis (one listener per open socket)",
+)
+DROPPED_CONSUMERS = Counter(
+    "chat_dropped_slow_consumers_total",
+    "Websocket clients dropped because a send timed out",
+)
+
+def _pool_stat(name: str) -> float:
+    stat = getattr(engine.pool, name, None)
+    return stat() if callable(stat) else 0
+
+def _redis_pool_stat(name: str) -> float:
+    from .services import redis_manager  # services imports this module
+    return len(getattr(redis_manager.redis_conn.connection_pool, name, ()))
+
+DB_POOL_CHECKED_OUT = Gauge("chat_db_pool_checked_out", "Database connections currently in use")
+DB_POOL_CHECKED_OUT.set_function(lambda: _pool_stat("checkedout"))
+DB_POOL_SIZE = Gauge("chat_db_pool_size", "Configured database pool size")
+DB_POOL_SIZE.set_function(lambda: _pool_stat("size"))
+DB_POOL_OVERFLOW = Gauge("chat_db_pool_overflow", "Database connections opened beyond the pool size")
+DB_POOL_OVERFLOW.set_function(lambda: max(0, _pool_stat("overflow")))
+REDIS_POOL_IN_USE = Gauge("chat_redis_pool_in_use", "Redis connections currently in use")
+REDIS_POOL_IN_USE.set_function(lambda: _redis_pool_stat("_in_use_connections"))
+REDIS_POOL_AVAILABLE = Gauge("chat_redis_pool_available", "Idle Redis connections in the pool")
+REDIS_POOL_AVAILABLE.set_function(lambda: _redis_pool_stat("_available_connections"))
+
+def _sample_stacks(stop: threading.Event, interval: float, counts: collections.Counter):
+    own_id = threading.get_ident()
+    while not stop.wait(interval):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            counts[";".join(reversed(stack))] += 1
+
+async def profile(seconds: float, interval: float = 0.005) -> str:
+    # Samples every thread's stack from a side thread while the event loop keeps
+    # serving traffic; output is folded stacks, ready for flamegraph tooling.
+    counts: collections.Counter = collections.Counter()
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sample_stacks, args=(stop, interval, counts), daemon=True)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        stop.set()
+        await asyncio.to_thread(sampler.join)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+def observe_http_request(method: str, route: str, status: int, started: float):
+    HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - started)
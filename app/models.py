@@ -1,7 +1,7 @@
 import datetime
 import uuid
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, ForeignKey
+    Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import UUID
@@ -36,14 +36,14 @@ class Room(Base):
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     owner = relationship("User", back_populates="owned_rooms")
-    members = relationship("RoomMember", back_populates="room", cascade="all, delete-orphan")
-    messages = relationship("Message", back_populates="room", cascade="all, delete-orphan")
-    invites = relationship("RoomInvite", back_populates="room", cascade="all, delete-orphan")
+    members = relationship("RoomMember", back_populates="room", cascade="all, delete-orphan", passive_deletes=True)
+    messages = relationship("Message", back_populates="room", cascade="all, delete-orphan", passive_deletes=True)
+    invites = relationship("RoomInvite", back_populates="room", cascade="all, delete-orphan", passive_deletes=True)
 
 class RoomMember(Base):
     __tablename__ = "room_members"
     id = Column(Integer, primary_key=True, index=True)
-    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     unread_count = Column(Integer, default=0)
     
@@ -53,7 +53,7 @@ class RoomMember(Base):
 class Message(Base):
     __tablename__ = "messages"
     id = Column(Integer, primary_key=True, index=True)
-    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -64,10 +64,14 @@ class Message(Base):
     room = relationship("Room", back_populates="messages")
     author = relationship("User", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_room_id_created_at", "room_id", "created_at"),
+    )
+
 class RoomInvite(Base):
     __tablename__ = "room_invites"
     id = Column(Integer, primary_key=True, index=True)
-    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
+    room_id = Column(Integer, ForeignKey("rooms.id", ondelete="CASCADE"), nullable=False)
     token = Column(UUID(as_uuid=True), unique=True, default=uuid.uuid4, index=True)
     
     room = relationship("Room", back_populates="invites")
\ No newline at end of file
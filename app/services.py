@@ -1,10 +1,13 @@
 import asyncio
 import json
+import time
 import redis.asyncio as redis
 from fastapi import WebSocket
 from typing import List, Dict, Set
 from .settings import settings
-from . import schemas
+from . import schemas, metrics
+
+ROOM_DELETED_EVENT = "room_deleted"
 
 class ConnectionManager:
     def __init__(self):
@@ -15,35 +18,84 @@ class ConnectionManager:
         if room_id not in self.active_connections:
             self.active_connections[room_id] = set()
         self.active_connections[room_id].add(websocket)
+        metrics.WS_CONNECTIONS.labels(room_id).set(len(self.active_connections[room_id]))
 
     def disconnect(self, websocket: WebSocket, room_id: int):
         if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
+            self.active_connections[room_id].discard(websocket)
+            metrics.WS_CONNECTIONS.labels(room_id).set(len(self.active_connections[room_id]))
             if not self.active_connections[room_id]:
                 del self.active_connections[room_id]
+                metrics.WS_CONNECTIONS.remove(room_id)
+
+    async def close_room(self, room_id: int):
+        connections = self.active_connections.pop(room_id, set())
+        if connections:
+            metrics.WS_CONNECTIONS.remove(room_id)
+        for connection in connections:
+            try:
+                await connection.close(code=1000, reason="Room deleted")
+            except Exception:
+                pass
+
+    async def _send(self, websocket: WebSocket, room_id: int, message: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(message), settings.WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # A client that cannot keep up is dropped rather than stalling the room.
+            metrics.DROPPED_CONSUMERS.inc()
+            self.disconnect(websocket, room_id)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+        except Exception:
+            # The client already went away; its own endpoint finishes the cleanup.
+            self.disconnect(websocket, room_id)
 
     async def broadcast_to_room(self, room_id: int, message: str):
         if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                await connection.send_text(message)
+            connections = list(self.active_connections[room_id])
+            await asyncio.gather(*(self._send(connection, room_id, message) for connection in connections))
 
 class RedisManager:
     def __init__(self):
         self.redis_conn = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
-    async def publish_message(self, room_id: int, message: schemas.Message):
+    async def publish_message(self, room_id: int, message: schemas.Message, received_at: float):
         channel = f"room:{room_id}"
-        await self.redis_conn.publish(channel, json.dumps(message.dict(), default=str))
+        # The client-facing JSON travels pre-serialized inside an envelope, next to
+        # wall-clock stamps that let the receiving worker time the hop and the pipeline.
+        envelope = {
+            "message": json.dumps(message.dict(), default=str),
+            "trace": {"received_at": received_at, "published_at": time.time()},
+        }
+        await self.redis_conn.publish(channel, json.dumps(envelope))
 
     async def subscribe_to_channel(self, room_id: int, connection_manager: ConnectionManager):
         channel = f"room:{room_id}"
         pubsub = self.redis_conn.pubsub()
         await pubsub.subscribe(channel)
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message:
-                await connection_manager.broadcast_to_room(room_id, message['data'])
-            await asyncio.sleep(0.01)
+        try:
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True)
+                if message:
+                    envelope = json.loads(message['data'])
+                    if envelope.get("event") == ROOM_DELETED_EVENT:
+                        await connection_manager.close_room(room_id)
+                        return
+                    trace = envelope["trace"]
+                    metrics.PIPELINE_STAGE_SECONDS.labels("redis_receive").observe(time.time() - trace["published_at"])
+                    metrics.BROADCAST_PENDING.inc()
+                    try:
+                        with metrics.PIPELINE_STAGE_SECONDS.labels("fanout").time():
+                            await connection_manager.broadcast_to_room(room_id, envelope["message"])
+                    finally:
+                        metrics.BROADCAST_PENDING.dec()
+                    metrics.PIPELINE_STAGE_SECONDS.labels("end_to_end").observe(time.time() - trace["received_at"])
+                await asyncio.sleep(0.01)
+        finally:
+            await pubsub.reset()
 
     async def add_active_user(self, room_id: int, user_id: int):
         await self.redis_conn.sadd(f"room:{room_id}:active_users", user_id)
@@ -53,6 +105,15 @@ class RedisManager:
         await self.redis_conn.srem(f"room:{room_id}:active_users", user_id)
         await self.redis_conn.srem("global:active_users", user_id)
 
+    async def purge_room(self, room_id: int):
+        # Listeners on every worker close their sockets for the room and unsubscribe.
+        channel = f"room:{room_id}"
+        await self.redis_conn.publish(channel, json.dumps({"event": ROOM_DELETED_EVENT, "room_id": room_id}))
+        active_users = await self.redis_conn.smembers(f"room:{room_id}:active_users")
+        if active_users:
+            await self.redis_conn.srem("global:active_users", *active_users)
+        await self.redis_conn.delete(f"room:{room_id}:active_users")
+
     async def get_active_users_in_room(self, room_id: int) -> int:
         return await self.redis_conn.scard(f"room:{room_id}:active_users")
 
@@ -1,9 +1,14 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     REDIS_URL: str
     SESSION_SECRET_KEY: str
+    MESSAGE_RETENTION_DAYS: Optional[int] = None
+    MESSAGE_ARCHIVE_DIR: str = "message_archive"
+    WS_SEND_TIMEOUT_SECONDS: float = 5.0
+    PROFILING_ENABLED: bool = False
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,22 @@
+import asyncio
+from app.database import AsyncSessionLocal
+from app.settings import settings
+from app import archive
+
+async def archive_messages_script():
+    if settings.MESSAGE_RETENTION_DAYS is None:
+        print("ℹ️  MESSAGE_RETENTION_DAYS is not set, nothing to archive.")
+        return
+
+    async with AsyncSessionLocal() as db:
+        try:
+            archived = await archive.archive_expired_messages(db)
+            print(f"✅ Archived {archived} messages older than {settings.MESSAGE_RETENTION_DAYS} days")
+            print(f"   Archive: {settings.MESSAGE_ARCHIVE_DIR}")
+
+        except Exception as e:
+            print(f"❌ An error occurred: {e}")
+            await db.rollback()
+
+if __name__ == "__main__":
+    asyncio.run(archive_messages_script())
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run main.py against local stand-ins for benchmarking")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench.db")
+    parser.add_argument("--redis-url", default=None, help="real Redis URL; fakeredis is used when omitted")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["REDIS_URL"] = args.redis_url or "redis://fakeredis"
+    os.environ.setdefault("SESSION_SECRET_KEY", "benchmark-secret")
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import uvicorn
+    from sqlalchemy import event
+    from app import services
+    from app.database import engine
+
+    if engine.dialect.name == "sqlite":
+        # The SQLite stand-in has one writer; let concurrent setup requests queue instead of failing.
+        @event.listens_for(engine.sync_engine, "connect")
+        def _tune_sqlite(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.close()
+
+    if args.redis_url is None:
+        import fakeredis
+        services.redis_manager.redis_conn = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+import httpx
+import psutil
+import websockets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+API = "/api/v1"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class ServerProcess:
+    def __init__(self, port: int, database_url: str, redis_url: Optional[str]):
+        self.port = port
+        cmd = [sys.executable, os.path.join(HERE, "serve.py"), "--port", str(port), "--database-url", database_url]
+        if redis_url:
+            cmd += ["--redis-url", redis_url]
+        self.proc = subprocess.Popen(cmd)
+        self.ps = psutil.Process(self.proc.pid)
+        self.cpu_samples: List[float] = []
+        self.rss_samples: List[int] = []
+
+    async def wait_ready(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.proc.poll() is not None:
+                    raise RuntimeError(f"server exited with code {self.proc.returncode}")
+                try:
+                    await client.get(f"http://127.0.0.1:{self.port}/")
+                    return
+                except httpx.TransportError:
+                    await asyncio.sleep(0.2)
+        raise RuntimeError("server did not start in time")
+
+    def _sample(self):
+        self.cpu_samples.append(self.ps.cpu_percent(None))
+        self.rss_samples.append(self.ps.memory_info().rss)
+
+    async def sample_resources(self, interval: float = 0.05):
+        self.ps.cpu_percent(None)
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                self._sample()
+        finally:
+            # Cover the tail of the window that ended mid-interval.
+            self._sample()
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+async def scrape_stage_timings(base_url: str) -> Dict[str, float]:
+    # Mean server-side time per pipeline stage, from the /metrics histograms.
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(f"{base_url}/metrics")).text
+    sums: Dict[str, float] = {}
+    counts: Dict[str, float] = {}
+    for line in text.splitlines():
+        match = re.match(r'chat_pipeline_stage_seconds_(sum|count)\{stage="(\w+)"\} (\S+)', line)
+        if match:
+            kind, stage, value = match.groups()
+            (sums if kind == "sum" else counts)[stage] = float(value)
+    return {
+        f"stage_{stage}_mean_ms": round(sums[stage] / counts[stage] * 1000, 3)
+        for stage in sorted(sums) if counts.get(stage)
+    }
+
+class LoadRun:
+    def __init__(self, base_url: str, args: argparse.Namespace):
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http://", "ws://", 1)
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:8]
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.seen: set = set()
+        self.deliveries = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    async def start_sessions(self, client: httpx.AsyncClient) -> List[str]:
+        sem = asyncio.Semaphore(self.args.concurrency)
+
+        async def start(i: int) -> str:
+            async with sem:
+                response = await client.post(
+                    f"{self.base_url}{API}/session/start", json={"name": f"bench-{self.run_id}-{i}"}
+                )
+                response.raise_for_status()
+                return response.cookies["session_id"]
+
+        return await asyncio.gather(*(start(i) for i in range(self.args.sessions)))
+
+    async def setup_rooms(self, client: httpx.AsyncClient, sessions: List[str]) -> Dict[int, List[str]]:
+        sem = asyncio.Semaphore(self.args.concurrency)
+        rooms: Dict[int, List[str]] = {}
+        for r in range(self.args.rooms):
+            owner = sessions[r % len(sessions)]
+            response = await client.post(
+                f"{self.base_url}{API}/rooms",
+                json={"name": f"bench-{self.run_id}-{r}"},
+                cookies={"session_id": owner},
+            )
+            response.raise_for_status()
+            rooms[response.json()["id"]] = [owner]
+
+        room_ids = list(rooms)
+
+        async def join(session_id: str, room_id: int):
+            async with sem:
+                response = await client.post(
+                    f"{self.base_url}{API}/rooms/{room_id}/join", cookies={"session_id": session_id}
+                )
+                if response.status_code == 201:
+                    rooms[room_id].append(session_id)
+
+        owners = {members[0] for members in rooms.values()}
+        await asyncio.gather(*(
+            join(session_id, room_ids[i % len(room_ids)])
+            for i, session_id in enumerate(sessions) if session_id not in owners
+        ))
+        return rooms
+
+    async def receive(self, ws, client_key: str, expected: int, done: asyncio.Event):
+        try:
+            await self._receive(ws, client_key, expected, done)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _receive(self, ws, client_key: str, expected: int, done: asyncio.Event):
+        async for raw in ws:
+            received = time.perf_counter()
+            payload = json.loads(raw)
+            nonce = payload.get("content", "")
+            if nonce not in self.sent_at:
+                continue
+            self.deliveries += 1
+            key = (client_key, nonce)
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            self.latencies.append(received - self.sent_at[nonce])
+            if len(self.seen) >= expected:
+                done.set()
+
+    async def client(self, session_id: str, room_id: int, expected: int, done: asyncio.Event, ready: asyncio.Barrier):
+        uri = f"{self.ws_url}{API}/ws/{room_id}"
+        client_key = f"{session_id}:{room_id}"
+        passed_barrier = False
+        try:
+            async with websockets.connect(uri, additional_headers={"Cookie": f"session_id={session_id}"}) as ws:
+                receiver = asyncio.create_task(self.receive(ws, client_key, expected, done))
+                await ready.wait()
+                passed_barrier = True
+                for i in range(self.args.messages):
+                    nonce = f"{self.run_id}:{client_key}:{i}"
+                    self.sent_at[nonce] = time.perf_counter()
+                    await ws.send(json.dumps({"content": nonce}))
+                    if self.args.interval:
+                        await asyncio.sleep(self.args.interval)
+                try:
+                    await asyncio.wait_for(done.wait(), self.args.drain_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                receiver.cancel()
+        except Exception as e:
+            self.errors += 1
+            if self.errors <= 5:
+                print(f"client error: {e!r}", file=sys.stderr)
+            # Still count towards the start barrier, but only once: waiting again after
+            # passing it would join a new cycle that never fills.
+            if not passed_barrier:
+                try:
+                    await ready.wait()
+                except asyncio.BrokenBarrierError:
+                    pass
+
+    async def run(self, on_load_start: Optional[Callable[[], None]] = None) -> dict:
+        async with httpx.AsyncClient(timeout=60) as client:
+            sessions = await self.start_sessions(client)
+            rooms = await self.setup_rooms(client, sessions)
+
+        # Every session joins a room, but only --clients of them hold a websocket open.
+        per_room = max(1, self.args.clients // len(rooms))
+        rooms = {room_id: members[:per_room] for room_id, members in rooms.items()}
+
+        done = asyncio.Event()
+        total_clients = sum(len(members) for members in rooms.values())
+        ready = asyncio.Barrier(total_clients + 1)
+        expected = sum(len(members) * len(members) * self.args.messages for members in rooms.values())
+
+        tasks = []
+        for room_id, members in rooms.items():
+            for session_id in members:
+                tasks.append(asyncio.create_task(
+                    self.client(session_id, room_id, expected, done, ready)
+                ))
+        await ready.wait()
+        if on_load_start:
+            on_load_start()
+        started = time.perf_counter()
+        load_timeout = self.args.messages * self.args.interval + self.args.drain_timeout + 30
+        _, pending = await asyncio.wait(tasks, timeout=load_timeout)
+        for task in pending:
+            task.cancel()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "sessions": len(sessions),
+            "clients": total_clients,
+            "rooms": len(rooms),
+            "messages_sent": len(self.sent_at),
+            "deliveries_expected": expected,
+            "deliveries_unique": len(self.latencies),
+            "deliveries_duplicate": self.duplicates,
+            "client_errors": self.errors,
+            "clients_timed_out": len(pending),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_msg_s": round(len(self.latencies) / elapsed, 1) if elapsed else 0.0,
+            "latency_p50_ms": round(_percentile(self.latencies, 50) * 1000, 2),
+            "latency_p99_ms": round(_percentile(self.latencies, 99) * 1000, 2),
+            "latency_mean_ms": round(statistics.fmean(self.latencies) * 1000, 2) if self.latencies else 0.0,
+        }
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    if result["throughput_msg_s"] < baseline["throughput_msg_s"] * (1 - tolerance):
+        regressions.append(f"throughput {result['throughput_msg_s']} < baseline {baseline['throughput_msg_s']}")
+    for key in ("latency_p50_ms", "latency_p99_ms"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    if result["deliveries_duplicate"] > baseline.get("deliveries_duplicate", 0) * (1 + tolerance):
+        regressions.append(
+            f"deliveries_duplicate {result['deliveries_duplicate']} > baseline {baseline.get('deliveries_duplicate', 0)}"
+        )
+    if result["deliveries_unique"] < result["deliveries_expected"]:
+        regressions.append(f"lost deliveries: {result['deliveries_unique']}/{result['deliveries_expected']}")
+    return regressions
+
+async def main_async(args: argparse.Namespace) -> int:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        server = ServerProcess(port, database_url, args.redis_url)
+        try:
+            await server.wait_ready()
+            samplers: List[asyncio.Task] = []
+            base_url = f"http://127.0.0.1:{port}"
+            # Sample the server only while websocket load runs, not during session setup.
+            result = await LoadRun(base_url, args).run(
+                lambda: samplers.append(asyncio.create_task(server.sample_resources()))
+            )
+            for sampler in samplers:
+                sampler.cancel()
+            await asyncio.gather(*samplers, return_exceptions=True)
+            result.update(await scrape_stage_timings(base_url))
+        finally:
+            server.stop()
+
+    result.update({
+        "server_cpu_avg_pct": round(statistics.fmean(server.cpu_samples), 1) if server.cpu_samples else 0.0,
+        "server_cpu_max_pct": round(max(server.cpu_samples, default=0.0), 1),
+        "server_rss_max_mb": round(max(server.rss_samples, default=0) / 2**20, 1),
+        "config": {
+            "sessions": args.sessions,
+            "clients": args.clients,
+            "rooms": args.rooms,
+            "messages": args.messages,
+            "interval": args.interval,
+            "database": "sqlite" if args.database_url is None else args.database_url.split(":", 1)[0],
+            "redis": "fakeredis" if args.redis_url is None else "redis",
+        },
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    })
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("Baseline was recorded with a different config; skipping comparison")
+            return 0
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket load test for the chat server")
+    parser.add_argument("--sessions", type=int, default=2000, help="users started via /session/start")
+    parser.add_argument("--clients", type=int, default=40, help="sessions that connect to /ws/{room_id}")
+    parser.add_argument("--rooms", type=int, default=10, help="rooms the sessions are spread across")
+    parser.add_argument("--messages", type=int, default=5, help="messages sent by each client")
+    parser.add_argument("--interval", type=float, default=0.05, help="delay between a client's sends, seconds")
+    parser.add_argument("--concurrency", type=int, default=50, help="parallel REST requests during setup")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for deliveries")
+    parser.add_argument("--database-url", default=None, help="defaults to a throwaway SQLite file")
+    parser.add_argument("--redis-url", default=None, help="defaults to in-process fakeredis")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression vs baseline")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 import os
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.database import engine
 from app.models import Base
 from app.api import router as api_router
+from app.settings import settings
+from app import metrics
 
 async def create_db_and_tables():
     async with engine.begin() as conn:
@@ -30,10 +35,30 @@ app.add_middleware(
     allow_headers=["*"],    
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe_http_request(
+        request.method, route.path if route else "unmatched", response.status_code, started
+    )
+    return response
+
 app.mount("/uploaded_files", StaticFiles(directory="uploaded_files"), name="uploaded_files")
 
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the Chat API"}
\ No newline at end of file
+    return {"message": "Welcome to the Chat API"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/debug/profile", response_class=PlainTextResponse, include_in_schema=False)
+async def read_profile(seconds: float = 10.0):
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return await metrics.profile(min(seconds, 60.0))